@@ -31,7 +31,7 @@ http://computermuseum.informatik.uni-stuttgart.de/dev/ibm_5110/technik/en/subrou
 """
 
 import logging
-from typing import Callable, Dict, Text, Tuple
+from typing import Callable, Dict, Optional, Text, Tuple
 
 from tsasm.data import all_args_parsed, Arg, Context, Op, parse_args_if_able, ParseOptions, Type
 from tsasm.codegen import common
@@ -39,15 +39,32 @@ from tsasm.codegen import common
 
 # All register symbols start with R.
 _PARSE_OPTIONS = ParseOptions(
-    register_prefix={'r'},
+    register_prefix=frozenset({'r'}),
     fractional_crements=False,  # Will set to True for MOVE and CALL, though.
 )
+_PARSE_OPTIONS_FRAC = _PARSE_OPTIONS._replace(fractional_crements=True)
+
+# The dict built by _build_palm_codegen, built on first use.
+_PALM_CODEGEN: Optional[
+    Dict[Text, Callable[[Context, Op], Tuple[Context, Op]]]] = None
 
 
 def palm_codegen() -> Dict[Text, Callable[[Context, Op], Tuple[Context, Op]]]:
   """Retrieve a dict mapping opcodes to code generators for PALM processors."""
+  global _PALM_CODEGEN
+  if _PALM_CODEGEN is None: _PALM_CODEGEN = _build_palm_codegen()
+  # Callers get their own copy, which they're free to extend.
+  return dict(_PALM_CODEGEN)
+
+
+def _build_palm_codegen(
+) -> Dict[Text, Callable[[Context, Op], Tuple[Context, Op]]]:
+  """Build the dict returned (in copies) by `palm_codegen`."""
+  # SNBSH is an alias for SNBC; both names share a single code generator.
+  codegen_snbc = _gen_codegen_reg_to_reg(0xC, 0xE)
+
   # Note mix-in of the "common" operations.
-  generators = dict({
+  generators = {
       'dec2': _gen_codegen_reg_to_reg(0, 0),
       'halt': _codegen_halt,
       'dec': _gen_codegen_reg_to_reg(0, 1),
@@ -86,8 +103,8 @@ def palm_codegen() -> Dict[Text, Callable[[Context, Op], Tuple[Context, Op]]]:
       'snz': _gen_codegen_onereg(0xC, 0xB, 0),
       'sns': _gen_codegen_onereg(0xC, 0xC, 0),
       'snbs': _gen_codegen_reg_to_reg(0xC, 0xD),
-      'snbc': _gen_codegen_reg_to_reg(0xC, 0xE),
-      'snbsh': _gen_codegen_reg_to_reg(0xC, 0xE),
+      'snbc': codegen_snbc,
+      'snbsh': codegen_snbc,
       'lwi': _codegen_lwi,
       'shr': _gen_codegen_onereg(0xE, 0xC, 1),
       'ror': _gen_codegen_onereg(0xE, 0xD, 1),
@@ -99,7 +116,8 @@ def palm_codegen() -> Dict[Text, Callable[[Context, Op], Tuple[Context, Op]]]:
       'jmp': _codegen_jmp,
       'call': _codegen_call,
       'rcall': _codegen_rcall,
-  }, **common.get_codegen())
+      **common.get_codegen(),
+  }
 
   # Index code generators under canonical names.
   return {k.casefold(): v for k, v in generators.items()}
@@ -108,27 +126,23 @@ def palm_codegen() -> Dict[Text, Callable[[Context, Op], Tuple[Context, Op]]]:
 ### Various argument checkers ###
 
 
-def _regcheck(*args: Arg):
-  """Verify registers in all args are valid; raise ValueError if not."""
-  for arg in args:
-    if not 0 <= arg.integer <= 15: raise ValueError(
-        'Invalid register {!r}'.format(arg.stripped))
+def _regcheck(arg: Arg):
+  """Verify register in arg is valid; raise ValueError if not."""
+  if not 0 <= arg.integer <= 15: raise ValueError(
+      'Invalid register {!r}'.format(arg.stripped))
 
 
-def _devcheck(*args: Arg):
-  """Verify registers in all args are valid; raise ValueError if not."""
-  for arg in args:
-    if not 0 <= arg.integer <= 15: raise ValueError(
-        'Invalid device address {!r} ({})'.format(
-            arg.stripped, arg.integer))
+def _devcheck(arg: Arg):
+  """Verify device address in arg is valid; raise ValueError if not."""
+  if not 0 <= arg.integer <= 15: raise ValueError(
+      'Invalid device address {!r} ({})'.format(arg.stripped, arg.integer))
 
 
-def _bytecheck(*args: Arg):
+def _bytecheck(arg: Arg):
   """Verify value is in the range -128..255; raise ValueError if not."""
-  for arg in args:
-    if not -128 <= arg.integer <= 255: raise ValueError(
-        'Byte literal {!r} ({}) not in range -128..255'.format(
-            arg.stripped, arg.integer))
+  if not -128 <= arg.integer <= 255: raise ValueError(
+      'Byte literal {!r} ({}) not in range -128..255'.format(
+          arg.stripped, arg.integer))
 
 
 def _regderefcheck(arg: Arg, postcrem_from: int = 0, postcrem_to: int = 0):
@@ -142,36 +156,35 @@ def _regderefcheck(arg: Arg, postcrem_from: int = 0, postcrem_to: int = 0):
           arg.stripped, postcrem_from, postcrem_to))
 
 
-def _addrcheck(*args: Arg):
-  """Verify valid address: none more than 65535."""
-  for arg in args:
-    if not 0 <= arg.integer <= 65535: raise ValueError(
-        'Invalid memory address {!r} (${:X}); valid range is $0..$FFFF'.format(
-            arg.stripped, arg.integer))
+def _addrcheck(arg: Arg):
+  """Verify valid address: no more than 65535."""
+  if not 0 <= arg.integer <= 65535: raise ValueError(
+      'Invalid memory address {!r} (${:X}); valid range is $0..$FFFF'.format(
+          arg.stripped, arg.integer))
 
 
-def _lowwordaddrcheck(*args: Arg):
-  for arg in args:
-    if arg.integer % 2: raise ValueError(
-        'Low word address {!r} (${:X}) is not 16-bit aligned (even)'.format(
-            arg.stripped, arg.integer))
-    if not 0 <= arg.integer <= 510: raise ValueError(
-        'Low word address {!r} (${:X}) is not in range 0..510'.format(
-            arg.stripped, arg.integer))
+def _lowwordaddrcheck(arg: Arg):
+  """Verify valid low word address: must be even and in 0..510."""
+  if arg.integer % 2: raise ValueError(
+      'Low word address {!r} (${:X}) is not 16-bit aligned (even)'.format(
+          arg.stripped, arg.integer))
+  if not 0 <= arg.integer <= 510: raise ValueError(
+      'Low word address {!r} (${:X}) is not in range 0..510'.format(
+          arg.stripped, arg.integer))
 
 
-def _jmpdestcheck(*args: Arg):
+def _jmpdestcheck(arg: Arg):
   """Verify valid address for a jump: must satisfy _addrcheck, must be even."""
-  _addrcheck(*args)
-  for arg in args:
-    if arg.integer % 2: raise ValueError(
-        'Invalid jump address {!r} (${:X}); must be 16-bit aligned'.format(
-            arg.stripped, arg.integer))
+  _addrcheck(arg)
+  if arg.integer % 2: raise ValueError(
+      'Invalid jump address {!r} (${:X}); must be 16-bit aligned'.format(
+          arg.stripped, arg.integer))
 
 
 def _callregcheck(arg1: Arg, arg2: Arg):
   """Verify valid registers for a jump: satisfy _addrcheck, be different."""
-  _addrcheck(arg1, arg2)
+  _addrcheck(arg1)
+  _addrcheck(arg2)
   if arg1.integer == arg2.integer: raise ValueError(
       'Arguments to subroutine call instructions must use different registers')
 
@@ -179,55 +192,102 @@ def _callregcheck(arg1: Arg, arg2: Arg):
 ### Other helpers ###
 
 
-def _reljmpoffset(context: Context, arg: Arg) -> int:
-  """Calculate program counter displacement for a relative jump, if possible."""
-  assert context.pos is not None  # Don't call unless we know our position.
-  true_displacement = arg.integer - context.pos
-  # As the current instruction runs, the address stored in R0 (the program
-  # counter) is 2 + the address of the currently-running instruction. This
-  # accounts for the bounds and offset calculations done below.
-  if not -254 <= true_displacement <= 258: raise ValueError(
-      'Invalid relative jump {!r} (${:X}); limits are -254..258'.format(
-          arg.stripped, arg.integer))
-  offset = true_displacement - 2
-  # Beware! ADD and SUB with an immediate argument take a value that's one
-  # closer to 0 than the actual value added/subtracted. There's no way to
-  # achieve a relative jump to the next instruction (so, a NOP, effectively).
-  # Keep this in mind when generating code.
-  return offset
+# Maps whole-unit postcrement values to address modifier nybbles. Keys are
+# compared by value, so float postcrements like -2.0 find their entries, while
+# fractional ones like 0.5 don't.
+_POSTCREMENT_TO_MODIFIER: Dict[float, int] = {
+    -4: 7, -3: 6, -2: 5, -1: 4, 0: 8, 1: 0, 2: 1, 3: 2, 4: 3,
+}
 
 
 def _postcrement_to_modifier(postcrement: float) -> int:
   """Convert a postcrement value (in -4..4) to a modifier value (in 0..8)."""
-  return (7, 6, 5, 4, 8, 0, 1, 2, 3)[int(postcrement) + 4]
+  try:
+    return _POSTCREMENT_TO_MODIFIER[postcrement]
+  except KeyError:
+    raise ValueError(
+        'Post-(in|de)crement by {} units is not supported'.format(postcrement))
+
+
+def _memoize_by_arg_text(
+    codegen: Callable[[Context, Op], Tuple[Context, Op]],
+) -> Callable[[Context, Op], Tuple[Context, Op]]:
+  """Memoise a code generator whose output depends only on its args' text.
+
+  This is only safe for handlers whose generated code can't depend on label
+  bindings or on the current output position, e.g. handlers that only take
+  register arguments. Results are cached by opcode and raw argument text, and
+  only once code generation for an op is complete; errors are never cached.
+  """
+  cache: Dict[Tuple[Optional[Text], Tuple[Text, ...]],
+              Tuple[Tuple[Arg, ...], Optional[Text], int]] = {}
+
+  def memoized(context: Context, op: Op) -> Tuple[Context, Op]:
+    key = (op.opcode, tuple(arg.stripped for arg in op.args))
+    if key in cache:
+      args, hexdata, num_bytes = cache[key]
+      op = op._replace(args=args, todo=None, hex=hexdata)
+      return context.advance_by_bytes(num_bytes), op
+    context, op = codegen(context, op)
+    if op.todo is None:
+      assert op.hex is not None  # mypy...
+      cache[key] = (op.args, op.hex, len(op.hex) // 2)
+    return context, op
+
+  return memoized
 
 
 
 ### Code generators and "generator generators" ###
 
 
+def _gen_codegen_simple(
+    argtypes: Tuple[Type, ...],
+    checks: Tuple[Callable[[Arg], None], ...],
+    encode: Callable[..., int],
+) -> Callable[[Context, Op], Tuple[Context, Op]]:
+  """'Code generator generator' for simple single-halfword instructions.
+
+  Args:
+    argtypes: required types of the instruction's arguments, in order.
+    checks: argument checkers to apply to each of the parsed arguments.
+    encode: computes the instruction word from the arguments' integer values.
+
+  Returns:
+    A code generating handler for an instruction with the specified traits.
+  """
+
+  def codegen_simple(context: Context, op: Op) -> Tuple[Context, Op]:
+    args = parse_args_if_able(_PARSE_OPTIONS, context, op, *argtypes)
+    if all_args_parsed(args):
+      for check, arg in zip(checks, args): check(arg)
+      word = encode(*(arg.integer for arg in args))
+      op = op._replace(args=args, todo=None, hex=f'{word:04X}')
+    else:
+      op = op._replace(args=args)
+    # We can still update pos whether we've parsed all args or not.
+    return context.advance_by_bytes(2), op
+
+  return codegen_simple
+
+
 def _gen_codegen_onereg(
     nybble_1: int,
     nybble_2: int,
     argpos: int,
 ) -> Callable[[Context, Op], Tuple[Context, Op]]:
   """'Code generator generator' for instructions with just one register arg."""
-
-             # "Position 0"     "Position 1"
-  template = ('{:X}{:X}0{:X}', '{:X}0{:X}{:X}')[argpos]
-
-  def codegen_onereg(context: Context, op: Op) -> Tuple[Context, Op]:
-    # Both register arguments to this opcode should be parseable.
-    op = op._replace(args=parse_args_if_able(
-        _PARSE_OPTIONS, context, op, Type.REGISTER))
-    if all_args_parsed(op.args):
-      _regcheck(*op.args)
-      digits = (nybble_1, op.args[0].integer, nybble_2)
-      op = op._replace(todo=None, hex=template.format(*digits))
-    # We can still update pos whether we've parsed all args or not.
-    return context.advance_by_bytes(2), op
-
-  return codegen_onereg
+  # The register number occupies the second (position 0) or third (position 1)
+  # nybble of the instruction; the remaining nybbles are fixed. Pick an encoder
+  # with the shift baked in now rather than looking it up on every call.
+  fixed = (nybble_1 << 12) | nybble_2
+  if argpos == 0:
+    encode = lambda r: fixed | (r << 8)
+  else:
+    encode = lambda r: fixed | (r << 4)
+  codegen_onereg = _gen_codegen_simple((Type.REGISTER,), (_regcheck,), encode)
+  # The output depends only on the register named in the argument.
+  return _memoize_by_arg_text(codegen_onereg)
 
 
 def _gen_codegen_reg_to_reg(
@@ -235,93 +295,71 @@ def _gen_codegen_reg_to_reg(
     nybble_2: int,
 ) -> Callable[[Context, Op], Tuple[Context, Op]]:
   """'Code generator generator' for register-to-register instructions."""
-
-  def codegen_reg_to_reg(context: Context, op: Op) -> Tuple[Context, Op]:
-    # Both register arguments to this opcode should be parseable.
-    op = op._replace(args=parse_args_if_able(
-        _PARSE_OPTIONS, context, op, Type.REGISTER, Type.REGISTER))
-    if all_args_parsed(op.args):
-      _regcheck(*op.args)
-      digits = (nybble_1, op.args[0].integer, op.args[1].integer, nybble_2)
-      op = op._replace(todo=None, hex='{:X}{:X}{:X}{:X}'.format(*digits))
-    # We can still update pos whether we've parsed all args or not.
-    return context.advance_by_bytes(2), op
-
-  return codegen_reg_to_reg
+  fixed = (nybble_1 << 12) | nybble_2
+  codegen_reg_to_reg = _gen_codegen_simple(
+      (Type.REGISTER, Type.REGISTER), (_regcheck, _regcheck),
+      lambda r1, r2: fixed | (r1 << 8) | (r2 << 4))
+  # The output depends only on the registers named in the arguments.
+  return _memoize_by_arg_text(codegen_reg_to_reg)
 
 
 def _gen_codegen_dev_to_reg(
     nybble: int,
 ) -> Callable[[Context, Op], Tuple[Context, Op]]:
   """'Code generator generator' for device-to-register instructions."""
-
-  def codegen_dev_to_reg(context: Context, op: Op) -> Tuple[Context, Op]:
-    op = op._replace(args=parse_args_if_able(
-        _PARSE_OPTIONS, context, op, Type.REGISTER, Type.ADDRESS))
-    if all_args_parsed(op.args):
-      _regcheck(op.args[0])
-      _devcheck(op.args[1])
-      digits = (nybble, op.args[0].integer, op.args[1].integer)
-      op = op._replace(todo=None, hex='{:X}{:X}{:X}F'.format(*digits))
-    # We can still update pos whether we've parsed all args or not.
-    return context.advance_by_bytes(2), op
-
-  return codegen_dev_to_reg
+  fixed = (nybble << 12) | 0xF
+  return _gen_codegen_simple(
+      (Type.REGISTER, Type.ADDRESS), (_regcheck, _devcheck),
+      lambda r, dev: fixed | (r << 8) | (dev << 4))
 
 
 def _gen_codegen_immed_to_reg(
     nybble: int,
 ) -> Callable[[Context, Op], Tuple[Context, Op]]:
   """'Code generator generator' for immediate-to-register instructions."""
-
-  def codegen_immed_to_reg(context: Context, op: Op) -> Tuple[Context, Op]:
-    op = op._replace(args=parse_args_if_able(
-        _PARSE_OPTIONS, context, op, Type.REGISTER, Type.NUMBER))
-    if all_args_parsed(op.args):
-      _regcheck(op.args[0])
-      _bytecheck(op.args[1])
-      digits = (nybble, op.args[0].integer, op.args[1].integer % 256)
-      op = op._replace(todo=None, hex='{:X}{:X}{:02X}'.format(*digits))
-    # We can still update pos whether we've parsed all args or not.
-    return context.advance_by_bytes(2), op
-
-  return codegen_immed_to_reg
+  fixed = nybble << 12
+  return _gen_codegen_simple(
+      (Type.REGISTER, Type.NUMBER), (_regcheck, _bytecheck),
+      lambda r, value: fixed | (r << 8) | (value & 0xFF))
 
 
 def _gen_codegen_add_or_sub(
     add_or_sub: str,
 ) -> Callable[[Context, Op], Tuple[Context, Op]]:
   """'Code generator generator' for ADD and SUB."""
+  fixed_immed = 0xA000 if add_or_sub == 'add' else 0xF000
+  fixed_reg = 8 if add_or_sub == 'add' else 9
 
   def codegen_add_or_sub(context: Context, op: Op) -> Tuple[Context, Op]:
-    op = op._replace(args=parse_args_if_able(
+    args = parse_args_if_able(
         _PARSE_OPTIONS, context, op,
-        Type.REGISTER, Type.NUMBER | Type.REGISTER))
-    if all_args_parsed(op.args):
-      _regcheck(op.args[0])
+        Type.REGISTER, Type.NUMBER | Type.REGISTER)
+    if all_args_parsed(args):
+      _regcheck(args[0])
 
       # Adding/subtracting an immediate value to/from a register.
-      if op.args[1].argtype & Type.NUMBER:
-        if not 0 <= op.args[1].integer <= 256: raise ValueError(
-          'Literal {!r} not in range 0..256'.format(op.args[1].stripped))
-        elif op.args[1].integer == 0:
+      if args[1].argtype & Type.NUMBER:
+        if not 0 <= args[1].integer <= 256: raise ValueError(
+          'Literal {!r} not in range 0..256'.format(args[1].stripped))
+        elif args[1].integer == 0:
           assert op.opcode is not None  # mypy...
           logging.warning(
               'Line %d: A #0 literal argument to %s is not supported by the %s '
               'instruction; generating a NOP (MOVE R0, R0) instead',
               op.lineno, op.opcode.upper(), op.opcode.upper())
-          op = op._replace(todo=None, hex='0004')
+          op = op._replace(args=args, todo=None, hex='0004')
         else:
-          digits = (0xA if add_or_sub == 'add' else 0xF,
-                    op.args[0].integer, (op.args[1].integer - 1) % 256)
-          op = op._replace(todo=None, hex='{:X}{:X}{:02X}'.format(*digits))
+          word = (fixed_immed | (args[0].integer << 8) |
+                  ((args[1].integer - 1) & 0xFF))
+          op = op._replace(args=args, todo=None, hex=f'{word:04X}')
 
       # Adding/subtracting the LSB of one register to/from another register.
       else:
-        _regcheck(op.args[1])
-        digits = (op.args[0].integer, op.args[1].integer,
-                  8 if add_or_sub == 'add' else 9)
-        op = op._replace(todo=None, hex='0{:X}{:X}{:X}'.format(*digits))
+        _regcheck(args[1])
+        word = (args[0].integer << 8) | (args[1].integer << 4) | fixed_reg
+        op = op._replace(args=args, todo=None, hex=f'{word:04X}')
+    else:
+      op = op._replace(args=args)
 
     # We can still update pos whether we've parsed all args or not.
     return context.advance_by_bytes(2), op
@@ -331,49 +369,55 @@ def _gen_codegen_add_or_sub(
 
 def _codegen_ctrl(context: Context, op: Op) -> Tuple[Context, Op]:
   """CTRL instruction."""
-  op = op._replace(args=parse_args_if_able(
-      _PARSE_OPTIONS, context, op, Type.ADDRESS, Type.NUMBER))
-  if all_args_parsed(op.args):
-    _devcheck(op.args[0])
-    _bytecheck(op.args[1])
-    digits = (op.args[0].integer, op.args[1].integer % 256)
-    op = op._replace(todo=None, hex='1{:X}{:02X}'.format(*digits))
+  args = parse_args_if_able(
+      _PARSE_OPTIONS, context, op, Type.ADDRESS, Type.NUMBER)
+  if all_args_parsed(args):
+    _devcheck(args[0])
+    _bytecheck(args[1])
+    word = 0x1000 | (args[0].integer << 8) | (args[1].integer & 0xFF)
+    op = op._replace(args=args, todo=None, hex=f'{word:04X}')
+  else:
+    op = op._replace(args=args)
   # We can still update pos whether we've parsed all args or not.
   return context.advance_by_bytes(2), op
 
 
 def _codegen_putb(context: Context, op: Op) -> Tuple[Context, Op]:
   """PUTB instruction."""
-  op = op._replace(args=parse_args_if_able(
-      _PARSE_OPTIONS, context, op, Type.ADDRESS, Type.DEREF_REGISTER))
-  if all_args_parsed(op.args):
-    _devcheck(op.args[0])
-    _regderefcheck(op.args[1], postcrem_from=-4, postcrem_to=4)
-    modifier = _postcrement_to_modifier(op.args[1].postcrement)
-    digits = (op.args[0].integer, op.args[1].integer, modifier)
-    op = op._replace(todo=None, hex='4{:X}{:X}{:X}'.format(*digits))
+  args = parse_args_if_able(
+      _PARSE_OPTIONS, context, op, Type.ADDRESS, Type.DEREF_REGISTER)
+  if all_args_parsed(args):
+    _devcheck(args[0])
+    _regderefcheck(args[1], postcrem_from=-4, postcrem_to=4)
+    modifier = _postcrement_to_modifier(args[1].postcrement)
+    word = 0x4000 | (args[0].integer << 8) | (args[1].integer << 4)
+    op = op._replace(args=args, todo=None, hex=f'{word | modifier:04X}')
+  else:
+    op = op._replace(args=args)
   # We can still update pos whether we've parsed all args or not.
   return context.advance_by_bytes(2), op
 
 
 def _codegen_getb(context: Context, op: Op) -> Tuple[Context, Op]:
   """GETB instruction."""
-  op = op._replace(args=parse_args_if_able(
+  args = parse_args_if_able(
       _PARSE_OPTIONS, context, op,
-      Type.REGISTER | Type.DEREF_REGISTER, Type.ADDRESS))
-  if all_args_parsed(op.args):
-    _devcheck(op.args[1])
+      Type.REGISTER | Type.DEREF_REGISTER, Type.ADDRESS)
+  if all_args_parsed(args):
+    _devcheck(args[1])
 
-    if op.args[0].argtype & Type.REGISTER:
-      _regcheck(op.args[0])
-      digits_r = (op.args[1].integer, op.args[0].integer)
-      op = op._replace(todo=None, hex='0{:X}{:X}E'.format(*digits_r))
+    if args[0].argtype & Type.REGISTER:
+      _regcheck(args[0])
+      word = (args[1].integer << 8) | (args[0].integer << 4) | 0xE
+      op = op._replace(args=args, todo=None, hex=f'{word:04X}')
 
     else:  # Type.DEREF_REGISTER
-      _regderefcheck(op.args[0], postcrem_from=-4, postcrem_to=4)
-      modifier = _postcrement_to_modifier(op.args[0].postcrement)
-      digits_d = (op.args[1].integer, op.args[0].integer, modifier)
-      op = op._replace(todo=None, hex='E{:X}{:X}{:X}'.format(*digits_d))
+      _regderefcheck(args[0], postcrem_from=-4, postcrem_to=4)
+      modifier = _postcrement_to_modifier(args[0].postcrement)
+      word = 0xE000 | (args[1].integer << 8) | (args[0].integer << 4)
+      op = op._replace(args=args, todo=None, hex=f'{word | modifier:04X}')
+  else:
+    op = op._replace(args=args)
 
   # We can still update pos whether we've parsed all args or not.
   return context.advance_by_bytes(2), op
@@ -381,64 +425,91 @@ def _codegen_getb(context: Context, op: Op) -> Tuple[Context, Op]:
 
 def _codegen_movb(context: Context, op: Op) -> Tuple[Context, Op]:
   """MOVB instruction."""
-  op = op._replace(args=parse_args_if_able(
+  args = parse_args_if_able(
       _PARSE_OPTIONS, context, op,
-      Type.REGISTER | Type.DEREF_REGISTER, Type.REGISTER | Type.DEREF_REGISTER))
+      Type.REGISTER | Type.DEREF_REGISTER, Type.REGISTER | Type.DEREF_REGISTER)
   # Both arguments to this opcode should be parseable.
-  if op.args[0].argtype == op.args[1].argtype: raise ValueError(
+  if args[0].argtype == args[1].argtype: raise ValueError(
       'One MOVB argument should be a register, and the other should be a '
       'register dereference')
-  if all_args_parsed(op.args):
-    nybble, argderef, argreg = ((6, op.args[1], op.args[0])
-                                if op.args[0].argtype & Type.REGISTER else
-                                (7, op.args[0], op.args[1]))
+  if all_args_parsed(args):
+    nybble, argderef, argreg = ((6, args[1], args[0])
+                                if args[0].argtype & Type.REGISTER else
+                                (7, args[0], args[1]))
     _regcheck(argreg)
     _regderefcheck(argderef, postcrem_from=-4, postcrem_to=4)
     modifier = _postcrement_to_modifier(argderef.postcrement)
-    digits = (nybble, argreg.integer, argderef.integer, modifier)
-    op = op._replace(todo=None, hex='{:X}{:X}{:X}{:X}'.format(*digits))
+    word = ((nybble << 12) | (argreg.integer << 8) |
+            (argderef.integer << 4) | modifier)
+    op = op._replace(args=args, todo=None, hex=f'{word:04X}')
+  else:
+    op = op._replace(args=args)
   # We can still update pos whether we've parsed all args or not.
   return context.advance_by_bytes(2), op
 
 
+def _encode_move_reg_reg(arg1: Arg, arg2: Arg) -> int:
+  """Encode a MOVE between registers."""
+  _regcheck(arg1)
+  _regcheck(arg2)
+  return (arg1.integer << 8) | (arg2.integer << 4) | 4
+
+
+def _encode_move_reg_lowword(arg1: Arg, arg2: Arg) -> int:
+  """Encode a MOVE to a register from a low memory location."""
+  _regcheck(arg1)
+  _lowwordaddrcheck(arg2)
+  return 0x2000 | (arg1.integer << 8) | (arg2.integer // 2)
+
+
+def _encode_move_lowword_reg(arg1: Arg, arg2: Arg) -> int:
+  """Encode a MOVE from a register to a low memory location."""
+  _regcheck(arg2)
+  _lowwordaddrcheck(arg1)
+  return 0x3000 | (arg2.integer << 8) | (arg1.integer // 2)
+
+
+def _encode_move_reg_deref(arg1: Arg, arg2: Arg) -> int:
+  """Encode a MOVE to a register from an address found in a register."""
+  _regcheck(arg1)
+  _regderefcheck(arg2, postcrem_from=-2, postcrem_to=2)  # Words.
+  modifier = _postcrement_to_modifier(2 * arg2.postcrement)
+  return 0xD000 | (arg2.integer << 8) | (arg1.integer << 4) | modifier
+
+
+def _encode_move_deref_reg(arg1: Arg, arg2: Arg) -> int:
+  """Encode a MOVE from a register to an address found in a register."""
+  _regcheck(arg2)
+  _regderefcheck(arg1, postcrem_from=-2, postcrem_to=2)  # Words.
+  modifier = _postcrement_to_modifier(2 * arg1.postcrement)
+  return 0x5000 | (arg2.integer << 8) | (arg1.integer << 4) | modifier
+
+
+# MOVE encoders indexed by the types of their (fully parsed) arguments. Any
+# combination missing from here lacks a register argument.
+_MOVE_ENCODERS: Dict[Tuple[Type, Type], Callable[[Arg, Arg], int]] = {
+    (Type.REGISTER, Type.REGISTER): _encode_move_reg_reg,
+    (Type.REGISTER, Type.ADDRESS): _encode_move_reg_lowword,
+    (Type.ADDRESS, Type.REGISTER): _encode_move_lowword_reg,
+    (Type.REGISTER, Type.DEREF_REGISTER): _encode_move_reg_deref,
+    (Type.DEREF_REGISTER, Type.REGISTER): _encode_move_deref_reg,
+}
+
+
 def _codegen_move(context: Context, op: Op) -> Tuple[Context, Op]:
   """MOVE instruction."""
-  op = op._replace(args=parse_args_if_able(  # Note fractional crements enabled.
-      _PARSE_OPTIONS._replace(fractional_crements=True), context, op,
+  args = parse_args_if_able(  # Note fractional crements enabled.
+      _PARSE_OPTIONS_FRAC, context, op,
       Type.ADDRESS | Type.REGISTER | Type.DEREF_REGISTER,
-      Type.ADDRESS | Type.REGISTER | Type.DEREF_REGISTER))
-  if all_args_parsed(op.args):
-
-    if not any(arg.argtype & Type.REGISTER for arg in op.args):
-      raise ValueError('At least one argument to MOVE must be a register')
-
-    # This is a move between registers.
-    elif op.args[0].argtype == op.args[1].argtype == Type.REGISTER:
-      _regcheck(*op.args)
-      digits_r = (op.args[0].integer, op.args[1].integer)
-      op = op._replace(todo=None, hex='0{:X}{:X}4'.format(*digits_r))
-
-    # This is a move from/to an address found at a specified memory location.
-    elif any(arg.argtype == Type.ADDRESS for arg in op.args):
-      nybble, argaddr, argreg = ((2, op.args[1], op.args[0])
-                                 if op.args[0].argtype & Type.REGISTER else
-                                 (3, op.args[0], op.args[1]))
-      _regcheck(argreg)
-      _lowwordaddrcheck(argaddr)
-      digits_a = (nybble, argreg.integer, argaddr.integer // 2)
-      op = op._replace(todo=None, hex='{:X}{:X}{:02X}'.format(*digits_a))
-
-    # This is a move from/to an address found in a register.
-    else:
-      nybble, argderef, argreg = (
-          (5, op.args[0], op.args[1])
-          if op.args[0].argtype & Type.DEREF_REGISTER else
-          (0xD, op.args[1], op.args[0]))
-      _regcheck(argreg)
-      _regderefcheck(argderef, postcrem_from=-2, postcrem_to=2)  # Words.
-      modifier = _postcrement_to_modifier(2 * argderef.postcrement)
-      digits_d = (nybble, op.args[1].integer, op.args[0].integer, modifier)
-      op = op._replace(todo=None, hex='{:X}{:X}{:X}{:X}'.format(*digits_d))
+      Type.ADDRESS | Type.REGISTER | Type.DEREF_REGISTER)
+  if all_args_parsed(args):
+    encode = _MOVE_ENCODERS.get((args[0].argtype, args[1].argtype))
+    if encode is None: raise ValueError(
+        'At least one argument to MOVE must be a register')
+    word = encode(args[0], args[1])
+    op = op._replace(args=args, todo=None, hex=f'{word:04X}')
+  else:
+    op = op._replace(args=args)
 
   # We can still update pos whether we've parsed all args or not.
   return context.advance_by_bytes(2), op
@@ -447,52 +518,64 @@ def _codegen_move(context: Context, op: Op) -> Tuple[Context, Op]:
 def _codegen_halt(context: Context, op: Op) -> Tuple[Context, Op]:
   """HALT pseudoinstruction: DEC2 R0, R0."""
   # This opcode takes no arguments. We still parse to make sure there are none.
-  op = op._replace(args=parse_args_if_able(
-      _PARSE_OPTIONS, context, op))
-  op = op._replace(todo=None, hex='0000')
-  return context.advance(op.hex), op
+  op = op._replace(args=parse_args_if_able(_PARSE_OPTIONS, context, op),
+                   todo=None, hex='0000')
+  return context.advance_by_bytes(2), op
 
 
 def _codegen_nop(context: Context, op: Op) -> Tuple[Context, Op]:
   """NOP pseudoinstruction: MOVE R0, R0."""
   # This opcode takes no arguments. We still parse to make sure there are none.
-  op = op._replace(args=parse_args_if_able(
-      _PARSE_OPTIONS, context, op))
-  op = op._replace(todo=None, hex='0004')
-  return context.advance(op.hex), op
+  op = op._replace(args=parse_args_if_able(_PARSE_OPTIONS, context, op),
+                   todo=None, hex='0004')
+  return context.advance_by_bytes(2), op
 
 
 def _codegen_lwi(context: Context, op: Op) -> Tuple[Context, Op]:
   """LWI pseudoinstruction: MOVE RX, (RO)+; DW i."""
-  op = op._replace(args=parse_args_if_able(
-      _PARSE_OPTIONS, context, op, Type.REGISTER, Type.NUMBER))
-  if all_args_parsed(op.args):
-    _regcheck(op.args[0])
-    if not -32767 <= op.args[1].integer <= 65535: raise ValueError(
+  args = parse_args_if_able(
+      _PARSE_OPTIONS, context, op, Type.REGISTER, Type.NUMBER)
+  if all_args_parsed(args):
+    _regcheck(args[0])
+    if not -32767 <= args[1].integer <= 65535: raise ValueError(
         'Halfword literal {} not in range -32768..65535'.format(
-            op.args[1].stripped))
-    digits = (op.args[0].integer, op.args[1].integer % 65536)
-    op = op._replace(todo=None, hex='D{:X}01{:04X}'.format(*digits))
+            args[1].stripped))
+    dword = (0xD0010000 | (args[0].integer << 24) |
+             (args[1].integer & 0xFFFF))
+    op = op._replace(args=args, todo=None, hex=f'{dword:08X}')
+  else:
+    op = op._replace(args=args)
   # We can still update pos whether we've parsed all args or not.
   return context.advance_by_bytes(4), op
 
 
 def _codegen_bra(context: Context, op: Op) -> Tuple[Context, Op]:
   """BRA pseudoinstruction: ADD/SUB R0,#<dist>."""
-  op = op._replace(args=parse_args_if_able(
-      _PARSE_OPTIONS, context, op, Type.ADDRESS))
-  if all_args_parsed(op.args) and context.pos is not None:
-    _jmpdestcheck(op.args[0])
-    offset = _reljmpoffset(context, op.args[0])
+  args = parse_args_if_able(
+      _PARSE_OPTIONS, context, op, Type.ADDRESS)
+  if all_args_parsed(args) and context.pos is not None:
+    _jmpdestcheck(args[0])
+    # As the current instruction runs, the address stored in R0 (the program
+    # counter) is 2 + the address of the currently-running instruction. This
+    # accounts for the bounds and offset calculations done here.
+    offset = args[0].integer - context.pos - 2
+    if not -256 <= offset <= 256: raise ValueError(
+        'Invalid relative jump {!r} (${:X}); limits are -254..258'.format(
+            args[0].stripped, args[0].integer))
+    # Beware! ADD and SUB with an immediate argument take a value that's one
+    # closer to 0 than the actual value added/subtracted. There's no way to
+    # achieve a relative jump to the next instruction (so, a NOP, effectively).
     if offset == 0:
       logging.warning(
           'Line %d: A BRA of +2 bytes (so, an ordinary PC increment) is not '
           'supported by the usual relative jump techniques; generating a NOP '
           '(MOVE R0, R0) instead', op.lineno)
-      op = op._replace(todo=None, hex='0004')
+      op = op._replace(args=args, todo=None, hex='0004')
     else:
-      digits = (0xA, offset - 1) if offset > 0 else (0xF, -offset - 1)
-      op = op._replace(todo=None, hex='{:X}0{:02X}'.format(*digits))
+      word = 0xA000 | (offset - 1) if offset > 0 else 0xF000 | (-offset - 1)
+      op = op._replace(args=args, todo=None, hex=f'{word:04X}')
+  else:
+    op = op._replace(args=args)
 
   # We can still update pos whether we've parsed all args or not.
   return context.advance_by_bytes(2), op
@@ -500,102 +583,113 @@ def _codegen_bra(context: Context, op: Op) -> Tuple[Context, Op]:
 
 def _codegen_jmp(context: Context, op: Op) -> Tuple[Context, Op]:
   """JMP pseudoinstruction: several underlying variants."""
-  op = op._replace(args=parse_args_if_able(
+  args = parse_args_if_able(
       _PARSE_OPTIONS, context, op,
-      Type.ADDRESS | Type.DEREF_REGISTER | Type.DEREF_ADDRESS))
+      Type.ADDRESS | Type.DEREF_REGISTER | Type.DEREF_ADDRESS)
   # Since this pseudoinstruction can produce code of different lengths, we
   # handle updating pos when "not all_args_parsed" in a special way.
-  if not all_args_parsed(op.args):
-    advance = 4 if op.args[0].argtype & Type.ADDRESS else 2
-    return context.advance_by_bytes(advance), op
+  if not all_args_parsed(args):
+    advance = 4 if args[0].argtype & Type.ADDRESS else 2
+    return context.advance_by_bytes(advance), op._replace(args=args)
 
   # We are branching to an address literal.
-  if op.args[0].argtype & Type.ADDRESS:
-    _jmpdestcheck(op.args[0])
-    op = op._replace(todo=None, hex='D001{:04X}'.format(op.args[0].integer))
+  if args[0].argtype & Type.ADDRESS:
+    _jmpdestcheck(args[0])
+    dword = 0xD0010000 | args[0].integer
+    op = op._replace(args=args, todo=None, hex=f'{dword:08X}')
 
   # We are branching to an address stored at a memory location in a register.
   # (To branch to an address inside a register, use RET).
-  elif op.args[0].argtype & Type.DEREF_REGISTER:
-    _regderefcheck(op.args[0], postcrem_from=0, postcrem_to=0)
-    op = op._replace(todo=None, hex='D0{:X}8'.format(op.args[0].integer))
+  elif args[0].argtype & Type.DEREF_REGISTER:
+    _regderefcheck(args[0], postcrem_from=0, postcrem_to=0)
+    word = 0xD008 | (args[0].integer << 4)
+    op = op._replace(args=args, todo=None, hex=f'{word:04X}')
 
   # We are branching to an address stored at a low memory location.
   else:
-    _lowwordaddrcheck(op.args[0])
-    op = op._replace(todo=None, hex='20{:02X}'.format(op.args[0].integer // 2))
+    _lowwordaddrcheck(args[0])
+    word = 0x2000 | (args[0].integer // 2)
+    op = op._replace(args=args, todo=None, hex=f'{word:04X}')
 
   return context.advance(op.hex), op
 
 
 def _codegen_call(context: Context, op: Op) -> Tuple[Context, Op]:
   """CALL pseudoinstruction: several underlying variants."""
-  op = op._replace(args=parse_args_if_able(
-      _PARSE_OPTIONS, context, op,
+  args = parse_args_if_able(  # Note fractional crements enabled.
+      _PARSE_OPTIONS_FRAC, context, op,
       Type.ADDRESS | Type.REGISTER | Type.DEREF_REGISTER | Type.DEREF_ADDRESS,
-      Type.REGISTER))
+      Type.REGISTER)
   # Since this pseudoinstruction can produce code of different lengths, we
   # handle updating pos when "not all_args_parsed" in a special way.
-  if not all_args_parsed(op.args):
-    advance = 6 if op.args[0].argtype & Type.ADDRESS else 4
-    return context.advance_by_bytes(advance), op
+  if not all_args_parsed(args):
+    advance = 6 if args[0].argtype & Type.ADDRESS else 4
+    return context.advance_by_bytes(advance), op._replace(args=args)
 
   # We are calling an address literal. Note that there is a way to do this in
   # two halfwords: for that, use the RCALL pseudoinstruction.
-  if op.args[0].argtype & Type.ADDRESS:
-    _jmpdestcheck(op.args[0])
-    _regcheck(op.args[1])
-    digits_a = (op.args[1].integer, op.args[1].integer, op.args[0].integer)
-    op = op._replace(todo=None, hex='0{:X}03D0{:X}1{:04X}'.format(*digits_a))
+  if args[0].argtype & Type.ADDRESS:
+    _jmpdestcheck(args[0])
+    _regcheck(args[1])
+    triple = (0x0003D0010000 | (args[1].integer << 40) |
+              (args[1].integer << 20) | args[0].integer)
+    op = op._replace(args=args, todo=None, hex=f'{triple:012X}')
 
   # We are calling an address stored inside a register.
-  elif op.args[0].argtype & Type.REGISTER:
-    _callregcheck(op.args[0], op.args[1])
-    digits_r = (op.args[1].integer, op.args[0].integer)
-    op = op._replace(todo=None, hex='0{:X}0300{:X}4'.format(*digits_r))
+  elif args[0].argtype & Type.REGISTER:
+    _callregcheck(args[0], args[1])
+    dword = 0x00030004 | (args[1].integer << 24) | (args[0].integer << 4)
+    op = op._replace(args=args, todo=None, hex=f'{dword:08X}')
 
   # We are calling an address stored at a memory location in a register.
-  elif op.args[0].argtype & Type.DEREF_REGISTER:
-    _callregcheck(op.args[0], op.args[1])
-    _regderefcheck(op.args[0], postcrem_from=-2, postcrem_to=2)  # Words.
-    modifier = _postcrement_to_modifier(2 * op.args[0].postcrement)
-    digits_d = (op.args[1].integer, op.args[0].integer, modifier)
-    op = op._replace(todo=None, hex='0{:X}03D0{:X}{:X}'.format(*digits_d))
+  elif args[0].argtype & Type.DEREF_REGISTER:
+    _callregcheck(args[0], args[1])
+    _regderefcheck(args[0], postcrem_from=-2, postcrem_to=2)  # Words.
+    modifier = _postcrement_to_modifier(2 * args[0].postcrement)
+    dword = (0x0003D000 | (args[1].integer << 24) |
+             (args[0].integer << 4) | modifier)
+    op = op._replace(args=args, todo=None, hex=f'{dword:08X}')
 
   # We are calling an address stored at a low memory location.
   else:
-    _regcheck(op.args[1])
-    _lowwordaddrcheck(op.args[0])
+    _regcheck(args[1])
+    _lowwordaddrcheck(args[0])
     assert op.opcode is not None  # mypy...
-    if op.args[0].precrement or op.args[0].postcrement: raise ValueError(
+    if args[0].precrement or args[0].postcrement: raise ValueError(
         'No (in/de)crementation is allowed for address dereference arguments '
         'to {}'.format(op.opcode.upper()))
-    digits = (op.args[1].integer, op.args[0].integer // 2)
-    op = op._replace(todo=None, hex='0{:X}0320{:02X}'.format(*digits))
+    dword = 0x00032000 | (args[1].integer << 24) | (args[0].integer // 2)
+    op = op._replace(args=args, todo=None, hex=f'{dword:08X}')
 
   return context.advance(op.hex), op
 
 
 def _codegen_rcall(context: Context, op: Op) -> Tuple[Context, Op]:
   """RCALL (R=relocatable) pseudoinstruction: INC2 Rx,R0; BRA <addr>."""
-  op = op._replace(args=parse_args_if_able(
-      _PARSE_OPTIONS, context, op, Type.ADDRESS, Type.REGISTER))
-  assert op.args is not None
-  if all_args_parsed(op.args) and context.pos is not None:
-    _jmpdestcheck(op.args[0])
-    _regcheck(op.args[1])
-    offset = _reljmpoffset(context, op.args[0])
+  args = parse_args_if_able(
+      _PARSE_OPTIONS, context, op, Type.ADDRESS, Type.REGISTER)
+  if all_args_parsed(args) and context.pos is not None:
+    _jmpdestcheck(args[0])
+    _regcheck(args[1])
+    # See _codegen_bra for notes on this calculation.
+    offset = args[0].integer - context.pos - 2
+    if not -256 <= offset <= 256: raise ValueError(
+        'Invalid relative jump {!r} (${:X}); limits are -254..258'.format(
+            args[0].stripped, args[0].integer))
     if offset == 0:
       logging.warning(
           'Line %d: A +2-byte RCALL (so, an ordinary PC increment) is not '
           'supported by the usual relative jump techniques; generating a NOP '
           '(MOVE R0, R0) instead', op.lineno)
-      op = op._replace(todo=None, hex='0{:X}030004'.format(op.args[1].integer))
+      dword = 0x00030004 | (args[1].integer << 24)
+      op = op._replace(args=args, todo=None, hex=f'{dword:08X}')
     else:
-      digits = ((op.args[1].integer, 0xA, offset - 1)
-                if offset > 0 else
-                (op.args[1].integer, 0xF, -offset - 1))
-      op = op._replace(todo=None, hex='0{:X}03{:X}0{:02X}'.format(*digits))
+      dword = (0x0003A000 | (offset - 1) if offset > 0 else
+               0x0003F000 | (-offset - 1))
+      dword |= args[1].integer << 24
+      op = op._replace(args=args, todo=None, hex=f'{dword:08X}')
+  else:
+    op = op._replace(args=args)
 
   # We can still update pos whether we've parsed all args or not.
   return context.advance_by_bytes(4), op
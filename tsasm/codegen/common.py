@@ -18,19 +18,38 @@ handlers into their collections of code-generating handlers. A module can also
 use this module's `encode_str` function if their systems use ASCII.
 """
 
-from typing import Callable, Dict, Text, Tuple
+import struct
 
-from tsasm.data import all_args_parsed, Context, LABEL_RE, Op, parse_args_if_able, parse_integer, parse_string, ParseOptions, Type
+from typing import Callable, Dict, List, Optional, Text, Tuple
+
+from tsasm.data import all_args_parsed, Arg, Context, is_label, Op, parse_args_if_able, parse_integer, parse_string, ParseOptions, Type
 
 
 _PARSE_OPTIONS = ParseOptions(
-    register_prefix=set(),
+    register_prefix=frozenset(),
     fractional_crements=False,
 )
 
 
+# Characters that start (and end) a string literal.
+_QUOTES = frozenset('"\'')
+
+# The dict built by _build_codegen, built on first use.
+_CODEGEN: Optional[
+    Dict[Text, Callable[[Context, Op], Tuple[Context, Op]]]] = None
+
+
 def get_codegen() -> Dict[Text, Callable[[Context, Op], Tuple[Context, Op]]]:
   """Retrieve the dict mapping opcodes to code generators for this machine."""
+  global _CODEGEN
+  if _CODEGEN is None: _CODEGEN = _build_codegen()
+  # Callers get their own copy, which they're free to extend.
+  return dict(_CODEGEN)
+
+
+def _build_codegen(
+) -> Dict[Text, Callable[[Context, Op], Tuple[Context, Op]]]:
+  """Build the dict returned (in copies) by `get_codegen`."""
   generators = {
       'org': _codegen_org,
       '.org': _codegen_org,
@@ -63,11 +82,12 @@ def _codegen_org(context: Context, op: Op) -> Tuple[Context, Op]:
   """ORG pseudoinstruction: set current output stream position."""
   # Try to parse our one argument. If successful, update our stream position.
   # Otherwise, leaving the op's `todo` unchanged means we'll try again later.
-  op = op._replace(args=parse_args_if_able(
-      _PARSE_OPTIONS, context, op, Type.ADDRESS))
-  if all_args_parsed(op.args):
-    op = op._replace(hex='', todo=None)
-    context = context._replace(pos=op.args[0].integer)
+  args = parse_args_if_able(_PARSE_OPTIONS, context, op, Type.ADDRESS)
+  if all_args_parsed(args):
+    op = op._replace(args=args, hex='', todo=None)
+    context = context._replace(pos=args[0].integer)
+  else:
+    op = op._replace(args=args)
   return context, op
 
 
@@ -91,47 +111,78 @@ def _gen_codegen_data(
     A code generating handler for a data statement with the specified traits.
   """
   endianity = 'little' if little_endian else 'big'
+  # Byte-sized data never needs padding to align it.
+  pad_to_align = align and element_size != 1
+  # A struct format character for packing all of an op's values in one call,
+  # if there's one for this element size.
+  pack_char = {1: 'B', 2: 'H', 4: 'L', 8: 'Q'}.get(element_size)
+  pack_order = '<' if little_endian else '>'
+  value_limit = 1 << (8 * element_size)
 
   def codegen_data(context: Context, op: Op) -> Tuple[Context, Op]:
-    # Accumulate hex code here, and track whether we have its final value worked
-    # out, or if we're still waiting on labels.
-    hexparts = []
+    # Accumulate binary data here, and track whether we have its final value
+    # worked out, or if we're still waiting on labels.
+    data = bytearray()
     all_hex_ok = True
 
     # Align the data to match the data quantum, if directed.
-    if align:
-      if element_size != 1:
-        if context.pos is None: raise ValueError(
-            'Unresolved labels above this line (or other factors) make it '
-            'impossible to know how to align this data statement. Consider '
-            "an ORG statement to make this data's memory location explicit.")
-        hexparts.append('00' * (context.pos % element_size))
-
-    # Generate data for each arg. Unlike nearly all other statements, we do most
-    # of the parsing ourselves.
-    for arg in op.args:
+    if pad_to_align:
+      if context.pos is None: raise ValueError(
+          'Unresolved labels above this line (or other factors) make it '
+          'impossible to know how to align this data statement. Consider '
+          "an ORG statement to make this data's memory location explicit.")
+      data.extend(bytes(context.pos % element_size))
+
+    # Collect data values for each arg. Unlike nearly all other statements, we
+    # do most of the parsing ourselves. If we're still waiting on labels, the
+    # integer values we did work out are saved in the op's args, so later
+    # passes only need to look at the unresolved labels.
+    resolved: List[Tuple[int, int]] = []
+    values: List[int] = []
+    for i, arg in enumerate(op.args):
+      # Did an earlier pass already work out this argument's value?
+      if arg.is_parsed():
+        val = arg.integer
+
       # Is the argument a string?
-      if arg.stripped.startswith('"') or arg.stripped.startswith("'"):
-        hexparts.append(''.join(
-            val.to_bytes(element_size, endianity).hex().upper()
-            for val in parse_string(parse_options, context, arg.stripped)))
+      elif arg.stripped[:1] in _QUOTES:
+        values.extend(parse_string(parse_options, context, arg.stripped))
+        continue
 
       # No, it must be a single integer value.
       else:
         # Does the argument look like a label? If so, try to resolve it and take
         # its value. If not, let's parse the argument as an integer value.
-        if LABEL_RE.fullmatch(arg.stripped):
-          all_hex_ok &= arg.stripped in context.labels
-          val = context.labels[arg.stripped] if all_hex_ok else 0
-        else:
+        if not is_label(arg.stripped):
           val = parse_integer(parse_options, context, arg.stripped)
-        # Now encode the value as hex.
-        hexparts.append(val.to_bytes(element_size, endianity).hex().upper())
-
-    # Package the hex data from all the args and, if appropriate, mark our job
-    # as complete.
-    op = op._replace(todo=None if all_hex_ok else op.todo,
-                     hex=''.join(hexparts))
-    return context.advance(op.hex), op
+          resolved.append((i, val))
+        elif arg.stripped in context.labels:
+          val = context.labels[arg.stripped]
+          resolved.append((i, val))
+        else:
+          val, all_hex_ok = 0, False  # A placeholder until the label is bound.
+
+      # Let int.to_bytes raise its usual error for values that won't fit.
+      if not 0 <= val < value_limit: val.to_bytes(element_size, endianity)
+      values.append(val)
+
+    # Convert all the values to binary data, in one go if we can.
+    if pack_char is not None:
+      data.extend(struct.pack(
+          f'{pack_order}{len(values)}{pack_char}', *values))
+    else:
+      for val in values:
+        data.extend(val.to_bytes(element_size, endianity))
+
+    # Package the data from all the args as hex. If all the values are known,
+    # mark our job as complete; otherwise save the values we did resolve.
+    if all_hex_ok:
+      op = op._replace(todo=None, hex=data.hex().upper())
+    else:
+      args = list(op.args)
+      for i, val in resolved:
+        args[i] = Arg(args[i].stripped, Type.NUMBER, val)
+      op = op._replace(args=tuple(args), hex=data.hex().upper())
+    return context.advance_by_bytes(len(data)), op
 
   return codegen_data
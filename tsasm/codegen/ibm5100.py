@@ -60,6 +60,11 @@ _CHARACTER_SET = (
     r"""∼↓∪⍵⊃↑⊂∧¨¯<≤=≥>≠∨\-÷→();:⌽⊖⍉⍟⌿⍀⍞!⍫ᵭ⍟⌹⌶⍝⍲⍱⍒⍋⍕⍎¬"&@#$%ÄⓉÖÜÅÆ℞Ñ£ÇÕÃ"""
 )
 
+# Maps each character above to its codepoint. Some characters (e.g. '⍟') appear
+# more than once in the character set; these map to their first occurrence.
+_CHARACTER_CODEPOINTS = {
+    c: i for i, c in reversed(list(enumerate(_CHARACTER_SET)))}
+
 
 # For now, the code generator is just the PALM code generator. We have no
 # 5100-specific opcodes or pseudo-opcodes yet.
@@ -69,9 +74,9 @@ get_codegen = _ibmpalm.palm_codegen
 def encode_str(data: Text) -> bytes:
   """Turn the string data in `data` into bytes for the IBM 5100."""
   try:
-    return bytes(_CHARACTER_SET.index(c) for c in data)
-  except ValueError:
-    missing = ''.join(c for c in data if c not in _CHARACTER_SET)
+    return bytes([_CHARACTER_CODEPOINTS[c] for c in data])
+  except KeyError:
+    missing = ''.join(c for c in data if c not in _CHARACTER_CODEPOINTS)
     raise ValueError('The IBM 5100 character set is missing some of the '
                      'characters in {!r}: ->{}<-'.format(data, missing))
 
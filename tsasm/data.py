@@ -14,15 +14,25 @@
 """Data structures and some helper functions for tsasm."""
 
 import enum
+import functools
 import re
 
-from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Text, Tuple
+from typing import Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Pattern, Sequence, Text, Tuple
 
 
 # A regular expression matching valid label strings. There's no better place to
 # keep this than here, regrettably.
 LABEL_RE = re.compile(r'[_a-zA-Z][\w_]*')
 
+# Characters that may begin a label, for rejecting most non-labels cheaply.
+_LABEL_START = frozenset(
+    '_abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ')
+
+
+def is_label(t: Text) -> bool:
+  """Return whether `t` is a valid label string."""
+  return t[:1] in _LABEL_START and LABEL_RE.fullmatch(t) is not None
+
 
 class Type(enum.Flag):
   """Type information for an argument in a line of source code.
@@ -43,22 +53,27 @@ class Type(enum.Flag):
   UNPARSED = enum.auto()        # An argument that hasn't been parsed yet
 
 
+# Bitwise operations on Flag members run fairly slow Python code, so the
+# hottest checks test bits in the members' integer values instead.
+_UNPARSED_BIT = Type.UNPARSED.value
+
+
 class ParseOptions(NamedTuple):
   """Options passed along to the argument parser.
 
   Attributes:
-    register_prefix: a set of strings listing valid register prefixes for the
-        current architecture. In some cases the prefix is the entire register
-        name; for civilised architectures, we might expect the most-used
-        prefixes to be followed by a number. Prefix-matching is always
+    register_prefix: a frozenset of strings listing valid register prefixes for
+        the current architecture. In some cases the prefix is the entire
+        register name; for civilised architectures, we might expect the
+        most-used prefixes to be followed by a number. Prefix-matching is always
         insensitive to the case choices of the user, but for this option, you,
         the implementer, should always use lowercase! For 68000 we might say
-        {'d', 'a', 'sp', 'pc', 'sr', 'ccr'}.
+        frozenset({'d', 'a', 'sp', 'pc', 'sr', 'ccr'}).
     fractional_crements: whether to permit fractional address incrementation and
         decrementation during dereferences. The "half-increment" symbol is '
         (single quote), and the "half-decrement" symbol is ~ (tilde).
   """
-  register_prefix: Set[Text]
+  register_prefix: FrozenSet[Text]
   fractional_crements: bool
 
 
@@ -88,17 +103,24 @@ class Arg(NamedTuple):
   precrement:      float = 0
   postcrement:     float = 0
 
+  def is_parsed(self) -> bool:
+    """Whether this argument is fully parsed (i.e. isn't UNPARSED)."""
+    return not self.argtype.value & _UNPARSED_BIT
+
   def parse(self, options: ParseOptions, context: 'Context', op: 'Op') -> 'Arg':
     # Don't repeat work that's already been completed.
-    if not self.argtype & Type.UNPARSED: return self
-    # Otherwise, try and parse ourselves multiple ways.
+    if not self.argtype.value & _UNPARSED_BIT: return self
+    # Otherwise, try and parse ourselves multiple ways. The first character or
+    # so usually rules out most ways, so try only the plausible ones first. If
+    # those fail, try them all, which also collects every parser's complaint.
     try:
-      return _attempt_several_parses([
-          ('as a dereference', _parse_deref),
-          ('   as a register', _parse_register),
-          ('     as a number', _parse_number),
-          ('   as an address', _parse_address)],
-          options, context, self.stripped)
+      try:
+        return _attempt_several_parses(
+            _plausible_arg_parsers(options, self.stripped),
+            options, context, self.stripped)
+      except ValueError:
+        return _attempt_several_parses(
+            _ARG_PARSERS, options, context, self.stripped)
     except ValueError as e:
       raise ValueError('While parsing {!r} on line {}:\n{}'.format(
           op.opcode.upper(), op.lineno, e))
@@ -154,13 +176,15 @@ class Context(NamedTuple):
   def advance(self, hexdata: Optional[Text]) -> 'Context':
     """Advance binary output position to accommodate `hexdata`."""
     assert hexdata is not None  # hexdata is only optional to put mypy at ease.
-    if self.pos is None: return self
-    return self._replace(pos=self.pos + len(hexdata) // 2)
+    return self.advance_by_bytes(len(hexdata) // 2)
 
   def advance_by_bytes(self, num_bytes: int) -> 'Context':
     """Advance binary output position by `num_bytes`."""
     if self.pos is None: return self
-    return self._replace(pos=self.pos + num_bytes)
+    # Nearly every statement calls this in every pass, and building the new
+    # Context directly is about twice as fast as _replace(pos=...).
+    return Context(self.arch, self.codegen, self.encode_str, self.labels,
+                   self.pos + num_bytes)
 
   def bind_label(self, label: Text) -> 'Context':
     """Bind `label` to the current binary output position."""
@@ -195,6 +219,10 @@ def parse_args_if_able(
       '{} takes exactly {} argument{}'.format(
           op.opcode.upper(), len(argtypes), '' if len(argtypes) == 1 else 's'))
 
+  # If a previous pass parsed all of the arguments, they've already passed the
+  # type checks below, so there's nothing more to do.
+  if all_args_parsed(op.args): return op.args
+
   # Attempt to parse arguments.
   args = tuple(arg.parse(options, context, op) for arg in op.args)
 
@@ -208,7 +236,13 @@ def parse_args_if_able(
 
 
 def all_args_parsed(args: Iterable[Arg]) -> bool:
-  return not any(arg.argtype & Type.UNPARSED for arg in args)
+  for arg in args:
+    if arg.argtype.value & _UNPARSED_BIT: return False
+  return True
+
+
+# Matches a '\' and the character after it (if any), which it escapes.
+_RE_ESCAPE = re.compile(r'\\(.?)', re.DOTALL)
 
 
 def parse_string(options: ParseOptions, context: Context, t: Text) -> bytes:
@@ -234,20 +268,8 @@ def parse_string(options: ParseOptions, context: Context, t: Text) -> bytes:
   if len(t) < 2 or t[0] != t[-1]: raise ValueError(
       'Could not parse {!r} as a delimited string.')
 
-  def unescape(chars):
-    r"""Delete the 1st, 3rd, 5th, ... '\' character in `chars` (an iterator)."""
-    try:
-      while True:
-        while True:
-          char = next(chars)
-          if char == '\\': break
-          yield char
-        yield next(chars)
-    except StopIteration:
-      return
-
   # Perform our primitive unescaping, then convert to bytes and return.
-  t = ''.join(unescape(iter(t[1:-1])))
+  t = _RE_ESCAPE.sub(r'\1', t[1:-1])
   return context.encode_str(t)
 
 
@@ -278,7 +300,6 @@ def parse_integer(options: ParseOptions, context: Context, t: Text) -> int:
   """
   if not t: raise ValueError(
       "Attempted to parse the empty string '' as an integer")
-  original = t  # Save the original text.
 
   # If this looks like a single-character string, attempt to parse it, then use
   # its byte value.
@@ -288,6 +309,27 @@ def parse_integer(options: ParseOptions, context: Context, t: Text) -> int:
         'Only one-character strings may be used as integer literals')
     return b[0]
 
+  return _parse_integer_literal(t)
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_integer_literal(t: Text) -> int:
+  """Parse a non-string integer literal for `parse_integer`.
+
+  This part of integer parsing depends only on the text, so results are cached:
+  the same literals turn up again and again, and in every assembler pass.
+
+  Args:
+    t: nonempty text data to parse as an integer.
+
+  Returns:
+    The parsed integer.
+
+  Raises:
+    ValueError: the text data in `t` was not parseable as an integer.
+  """
+  original = t  # Save the original text.
+
   # Canonicalise "letters" in the text to lowercase and strip whitespace.
   t = t.lower().strip()
 
@@ -352,7 +394,7 @@ def _parse_number(options: ParseOptions, context: Context, t: Text) -> Arg:
     pass
 
   # Try parsing it now as a label.
-  if not LABEL_RE.fullmatch(tonumber): complain()
+  if not is_label(tonumber): complain()
   try:
     return Arg(stripped=t, argtype=Type.NUMBER,
                integer=context.labels[tonumber])
@@ -393,7 +435,7 @@ def _parse_address(options: ParseOptions, context: Context, t: Text) -> Arg:
     pass
 
   # Try parsing it now as a label.
-  if not LABEL_RE.fullmatch(t): complain()
+  if not is_label(t): complain()
   try:
     return Arg(stripped=t, argtype=Type.ADDRESS, integer=context.labels[t])
   except KeyError:
@@ -422,12 +464,11 @@ def _parse_register(options: ParseOptions, context: Context, t: Text) -> Arg:
   t = t.lower().strip()
 
   # Try to capture the longest-possible register prefix.
-  for prefix in sorted(options.register_prefix, key=len, reverse=True):
-    if t.startswith(prefix):
-      regnum_text = t[len(prefix):]
-      break
-  else: raise ValueError(
+  match = _register_prefix_re(options.register_prefix).match(t)
+  if match is None: raise ValueError(
       'Register specification {!r} has an unknown prefix.'.format(original))
+  prefix = match[0]
+  regnum_text = t[len(prefix):]
 
   # Obtain the register number, if one is specified. Otherwise, -1 is used.
   regnum = parse_integer(options, context, regnum_text) if regnum_text else -1
@@ -436,6 +477,15 @@ def _parse_register(options: ParseOptions, context: Context, t: Text) -> Arg:
              integer=regnum, register_prefix=prefix)
 
 
+@functools.lru_cache(maxsize=None)
+def _register_prefix_re(register_prefix: FrozenSet[Text]) -> Pattern:
+  """Compile a regex matching the longest register prefix starting some text."""
+  if not register_prefix: return re.compile(r'(?!)')  # Never matches.
+  return re.compile('|'.join(
+      re.escape(prefix)
+      for prefix in sorted(register_prefix, key=len, reverse=True)))
+
+
 def _parse_deref(
     options: ParseOptions, context: Context, t: Text) -> Arg:
   """Parse an argument that dereferences and maybe "crements" an address.
@@ -466,18 +516,16 @@ def _parse_deref(
   def complain():
     raise ValueError('Malformed dereference {!r}'.format(original))
 
-  # Here are the increments of "crementation". We can have fractional (half)
+  # Here are the symbols for "crementation". We can have fractional (half)
   # increments to denote things like advancing by single bytes in operations
   # that consume whole halfwords.
-  crements: Dict[Text, float] = {'-': -1, '+': 1}
-  if options.fractional_crements: crements.update({'~': -0.5, "'": 0.5})
+  crement_chars = "+-~'" if options.fractional_crements else '+-'
 
   # Count "precrementation".
-  precrement: float = 0
-  while t[0] in crements:
-    precrement += crements[t[0]]
-    t = t[1:]
-    if not t: complain()
+  rest = t.lstrip(crement_chars)
+  if not rest: complain()
+  precrement = _count_crements(t[:len(t) - len(rest)])
+  t = rest
 
   # The next character should be '('.
   if t[0] != '(': complain()
@@ -489,19 +537,23 @@ def _parse_deref(
   except ValueError:
     complain()
 
-  toderef = _attempt_several_parses(
-      [('  as a register', _parse_register),
-       ('  as an address', _parse_address)],
-      options, context, toderef_text)
-
-  # Count "postcrementation".
-  postcrement: float = 0
-  while t and t[0] in '+-':
-    postcrement += crements[t[0]]
-    t = t[1:]
+  # If the text starts with a register prefix, try parsing it as a register
+  # first; otherwise only an address will do. Failing that, try both again to
+  # gather all of the complaints.
+  deref_parsers = _DEREF_PARSERS
+  if not _register_prefix_re(options.register_prefix).match(
+      toderef_text.lower().strip()):
+    deref_parsers = deref_parsers[1:]
+  try:
+    toderef = _attempt_several_parses(
+        deref_parsers, options, context, toderef_text)
+  except ValueError:
+    toderef = _attempt_several_parses(
+        _DEREF_PARSERS, options, context, toderef_text)
 
-  # That should account for all the text.
-  if t: complain()
+  # Count "postcrementation". That should account for all the text.
+  if t.lstrip('+-'): complain()
+  postcrement = _count_crements(t)
 
   # Construct the return type.
   argtype = (Type.DEREF_REGISTER if toderef.argtype & Type.REGISTER
@@ -511,6 +563,54 @@ def _parse_deref(
              precrement=precrement, postcrement=postcrement)
 
 
+# The ways to parse the thing being dereferenced, in order of precedence.
+_DEREF_PARSERS: Sequence[Tuple[
+    Text,
+    Callable[[ParseOptions, Context, Text], Arg]
+]] = (
+    ('  as a register', _parse_register),
+    ('  as an address', _parse_address),
+)
+
+
+def _count_crements(crements: Text) -> float:
+  """Total up the "crementation" symbols (see `_parse_deref`) in `crements`."""
+  total = crements.count('+') - crements.count('-')
+  halves = crements.count("'") - crements.count('~')
+  return total + halves / 2 if halves else total
+
+
+# All of the ways to parse an argument, in order of precedence.
+_ARG_PARSERS = (
+    ('as a dereference', _parse_deref),
+    ('   as a register', _parse_register),
+    ('     as a number', _parse_number),
+    ('   as an address', _parse_address),
+)
+
+
+def _plausible_arg_parsers(
+    options: ParseOptions,
+    t: Text,
+) -> Sequence[Tuple[Text, Callable[[ParseOptions, Context, Text], Arg]]]:
+  """Select entries of `_ARG_PARSERS` that could possibly parse `t`.
+
+  The selection preserves precedence: any parser left out would have failed
+  anyway, so the first of these to succeed is the first of all to succeed.
+  """
+  if not t: return _ARG_PARSERS
+  deref, register, number, address = _ARG_PARSERS
+  first = t[0]
+  crement_chars = "+-~'" if options.fractional_crements else '+-'
+
+  parsers = []
+  if first == '(' or first in crement_chars: parsers.append(deref)
+  if _register_prefix_re(options.register_prefix).match(t.lower()):
+    parsers.append(register)
+  parsers.append(number if first == '#' else address)
+  return parsers
+
+
 def _attempt_several_parses(
     parsers: Sequence[Tuple[
         Text,
@@ -24,7 +24,7 @@ import logging
 import re
 import sys
 
-from typing import BinaryIO, Callable, Dict, List, Optional, Set, Text, TextIO, Tuple
+from typing import BinaryIO, Callable, Dict, List, Optional, Text, TextIO, Tuple
 
 from tsasm.data import Arg, Context, LABEL_RE, Op
 
@@ -41,6 +41,9 @@ _RE_CODE = re.compile(r'(?:[^\'";]' + '|' +
 _RE_TOKEN = re.compile(r'(?:[^\'"\s,]' + '|' +
                        _RE_STR_APOSTROPHE + '|' +
                        _RE_STR_QUOTEMARKS + ')+')
+# Matches a token that labels its line, capturing the label. Note that only the
+# start of the label is checked against LABEL_RE.
+_RE_LABEL_TOKEN = re.compile('(' + LABEL_RE.pattern + '.*):', re.DOTALL)
 
 
 def _define_flags() -> argparse.ArgumentParser:
@@ -95,29 +98,33 @@ def read_source(source_input: TextIO) -> Tuple[List[Op], Tuple[Text, ...]]:
     [1]: Every line of the original file, with newlines removed.
   """
   ops: List[Op] = []                    # Accumulates Op objects.
-  lines: List[Text] = []                # Accumulates lines of source code text.
-  current_labels: Set[Text] = set()     # Labels to refer to the next code line.
+  current_labels: List[Text] = []       # Labels to refer to the next code line.
   claimed_labels: Dict[Text, int] = {}  # Labels already set, and on which line.
 
-  for lineno, line in enumerate(source_input):
-    # Initial processing: strip newlines.
-    line = line.rstrip('\r\n')
-    lines.append(line)
-    # Strip comments.
+  # Read all of the source code at once and split it into lines, stripping
+  # newlines. As when iterating over lines of a file, text after the last
+  # newline only counts as a line if there is some.
+  lines = source_input.read().split('\n')
+  if not lines[-1]: lines.pop()
+  lines = [line.rstrip('\r') for line in lines]
+
+  for lineno, line in enumerate(lines):
+    # Find where comments start, then tokenise the code before them (without
+    # copying it out of the line first).
     match = _RE_CODE.match(line)  # Guaranteed to match at least once.
     assert match is not None      # Although mypy doesn't believe me.
-    code = match[0]
-    # Tokenise the code.
-    tokens = tuple(_RE_TOKEN.findall(code))
+    tokens = tuple(_RE_TOKEN.findall(line, 0, match.end()))
 
     # Is there a label? If so, check validity and uniqueness. If checks pass,
     # add the label to current and claimed labels.
-    if tokens and tokens[0].endswith(':') and LABEL_RE.match(tokens[0][:-1]):
-      label, tokens = tokens[0][:-1], tokens[1:]
+    match = _RE_LABEL_TOKEN.fullmatch(tokens[0]) if tokens else None
+    if match:
+      # Interned label names make label dict lookups cheaper later on.
+      label, tokens = sys.intern(match[1]), tokens[1:]
       if label in claimed_labels: raise Error(
           lineno, line, 'The label {} was already used on line {}'.format(
               label, claimed_labels[label]))
-      current_labels.add(label)
+      current_labels.append(label)
       claimed_labels[label] = lineno
 
     # This rest of this line (if it exists) is apparently intended to be a line
@@ -128,7 +135,7 @@ def read_source(source_input: TextIO) -> Tuple[List[Op], Tuple[Text, ...]]:
           lineno=lineno,
           line=line,
           tokens=tokens,
-          labels=tuple(sorted(current_labels)),
+          labels=tuple(current_labels),
           todo=asmpass_lexer))
       current_labels.clear()
 
@@ -151,8 +158,9 @@ def asmpass_lexer(context: Context, op: Op) -> Tuple[Context, Op]:
   """
   # Obtain opcode and arguments. At least the opcode is guaranteed to exist.
   opcode, etcetera = op.tokens[0], op.tokens[1:]
-  opcode = opcode.casefold()  # Canonicalise opcode.
-  args = tuple(Arg(stripped=a.strip()) for a in etcetera)
+  opcode = sys.intern(opcode.casefold())  # Canonicalise opcode.
+  # Arg text is interned since it is often a label name used as a dict key.
+  args = tuple(Arg(stripped=sys.intern(a.strip())) for a in etcetera)
   # Update op with opcode and args, then trigger code generation in the next
   # pass. Argument parsing occurs during code generation, allowing for symbols
   # to be bound as late as possible.
@@ -199,15 +207,14 @@ def asmpass_codegen(context: Context, op: Op) -> Tuple[Context, Op]:
             op.opcode, context.arch))
     context, op = context.codegen[op.opcode](context, op)
 
-  # If we haven't bound all the labels associated with this line of code, then
+  # If we haven't bound all the labels associated with this line of code, or if
+  # we haven't got an output location for the hex data generated from it, then
   # we've got to try generating this line of code again, no matter what the
-  # opcode's code-generating handler thinks about it.
-  if not all(label in context.labels for label in op.labels):
-    op = op._replace(todo=asmpass_codegen)
-
-  # If we haven't got an output location for the hex data generated from this
-  # line of code, then we force another pass in that case, too.
-  if context.pos is None:
+  # opcode's code-generating handler thinks about it. (The todo may already be
+  # set for another try, in which case there's nothing to change.)
+  if op.todo is not asmpass_codegen and (
+      context.pos is None or
+      (op.labels and not all(label in context.labels for label in op.labels))):
     op = op._replace(todo=asmpass_codegen)
 
   return context, op
@@ -248,7 +255,9 @@ def assemble(
 
     # Perform a pass through the code. When catching errors, ValueErrors are
     # "normal" errors owing to bugs in user code; other types are "internal"
-    # errors that are likely our fault.
+    # errors that are likely our fault. Along the way, count the ops that
+    # still need more code generation after this pass.
+    num_pending = 0
     for i in range(len(ops)):
       # If the position of this op has already been calculated, that value is
       # authoritative. Otherwise, if we have new knowledge of this position,
@@ -258,32 +267,38 @@ def assemble(
       elif context.pos is not None and ops[i].todo is not asmpass_lexer:
         addrs[i] = context.pos
 
-      # If this op has a `todo`, execute it and apply some checks.
-      if ops[i].todo is not None:
-        try:
-          context, ops[i] = ops[i].todo(context, ops[i])
-          if ops[i].hex and len(ops[i].hex) % 2: raise Error(
-              ops[i].lineno, ops[i].line, 'Extra nybble in generated hex.')
-        except ValueError as error:
-          raise Error(ops[i].lineno, ops[i].line, str(error))
-        except Exception as error:
-          raise Error(ops[i].lineno, ops[i].line,
-                      'Internal error, sorry!\n  {}'.format(error))
+      # Ops that are already done have nothing more to execute. (We still record
+      # their positions above: an op like ORG can finish before its own position
+      # is known.)
+      if ops[i].todo is None: continue
+
+      # Execute this op's `todo` and apply some checks.
+      try:
+        context, ops[i] = ops[i].todo(context, ops[i])
+        if ops[i].hex and len(ops[i].hex) % 2: raise Error(
+            ops[i].lineno, ops[i].line, 'Extra nybble in generated hex.')
+      except ValueError as error:
+        raise Error(ops[i].lineno, ops[i].line, str(error))
+      except Exception as error:
+        raise Error(ops[i].lineno, ops[i].line,
+                    'Internal error, sorry!\n  {}'.format(error))
+      if ops[i].todo is asmpass_codegen: num_pending += 1
 
     # With the pass complete, see if it's time to stop.
-    ops_with_codegen_todos = tuple(
-        op for op in ops if op.todo == asmpass_codegen)
-    if num_ops_with_codegen_todos == len(ops_with_codegen_todos): break
-    num_ops_with_codegen_todos = len(ops_with_codegen_todos)
+    if num_ops_with_codegen_todos == num_pending: break
+    num_ops_with_codegen_todos = num_pending
 
   # See if compilation was successful.
-  if ops_with_codegen_todos: raise Error(
-      ops[-1].lineno + 1, '<EOF>',
-      'After {} passes, {} statements still have unresolved labels or other '
-      'issues preventing full assembly. These statements are:\n'
-      '  {}\n'.format(pass_count, len(ops_with_codegen_todos),
-                      '\n  '.join('{:>5}: {}'.format(op.lineno, op.line)
-                                  for op in ops_with_codegen_todos)))
+  if num_pending:
+    ops_with_codegen_todos = tuple(
+        op for op in ops if op.todo is asmpass_codegen)
+    raise Error(
+        ops[-1].lineno + 1, '<EOF>',
+        'After {} passes, {} statements still have unresolved labels or other '
+        'issues preventing full assembly. These statements are:\n'
+        '  {}\n'.format(pass_count, len(ops_with_codegen_todos),
+                        '\n  '.join('{:>5}: {}'.format(op.lineno, op.line)
+                                    for op in ops_with_codegen_todos)))
 
   # Construct a mapping from memory addresses to ops whose binary data will
   # start at those addresses. Complain if multiple ops that actually generate
@@ -321,24 +336,22 @@ def _switch_arch(
 
 def _emit_binary(output_file: BinaryIO, addr_to_op: Dict[int, Op]):
   """Write binary data in an address-to-Op map to an output file."""
-  pos = 0  # Amount of binary data written so far.
+  data = bytearray()  # Binary output, written to output_file all at once.
   for addr, op in sorted(addr_to_op.items()):
-    # Add $00 padding to get from pos to addr, or, if "negative padding" would
-    # be required, warn the user and refuse to write output for this op.
-    if addr > pos:
-      output_file.write(b'\0' * (addr - pos))
-      pos = addr
-    elif addr < pos:
+    # Add $00 padding to get from the end of data to addr, or, if "negative
+    # padding" would be required, warn the user and refuse to write output for
+    # this op.
+    if addr > len(data):
+      data.extend(bytes(addr - len(data)))
+    elif addr < len(data):
       logging.warning(
           'Not writing the following source code line to the binary output:\n'
           '   %5d: %s\nsince it wishes to be written at memory location $%X, '
           'and we have already\nwritten $%X bytes to the output already.',
-          op.lineno, op.line, addr, pos)
-    # Write hex data for this line to the output.
-    if op.hex is not None:
-      data = bytes.fromhex(op.hex)
-      output_file.write(data)
-      pos += len(data)
+          op.lineno, op.line, addr, len(data))
+    # Add hex data for this line to the output.
+    if op.hex is not None: data.extend(bytes.fromhex(op.hex))
+  output_file.write(data)
 
 
 def _emit_listing(
@@ -347,8 +360,11 @@ def _emit_listing(
     addr_to_op: Dict[int, Op],
 ):
   """Emit lines of the input source file annotated with assembly results."""
-  # Construct a map from source line to (address, Op) tuple.
-  lineno_to_addr_op = {op.lineno: (addr, op) for addr, op in addr_to_op.items()}
+  # Arrange (address, Op) tuples in source line order, so we can step through
+  # them alongside the source lines.
+  addr_ops = sorted(addr_to_op.items(), key=lambda addr_op: addr_op[1].lineno)
+  addr_ops.append((0, Op(lineno=-1, line='')))  # Sentinel: matches no line.
+  next_addr_op = 0  # Index of the next (address, Op) tuple to list.
 
   # Determine what the longest hex string is in all of the ops, and from this,
   # how much of the printed line to devote to hex data.
@@ -363,26 +379,30 @@ def _emit_listing(
   make_hexdata = lambda h: ' '.join(
       h[i:i+4] for i in range(0, len(h), 4)).upper()
 
-  # Create listing, line by line.
+  # Create listing, line by line. We accumulate the listing's lines here and
+  # write them all at once.
+  listing: List[Text] = []
   addr = 0
   for lineno, line in enumerate(lines):
     # Print up to 16 digits of hex data, plus the line of code itself.
     op_hex_rest = hexdata = ''
-    if lineno in lineno_to_addr_op:
-      addr, op = lineno_to_addr_op[lineno]
+    if addr_ops[next_addr_op][1].lineno == lineno:
+      addr, op = addr_ops[next_addr_op]
+      next_addr_op += 1
       # For marshaling hex data to print, up to the first 16 hex digits can fit.
       op_hex_rest = (op.hex or '').upper()
       op_hex_first, op_hex_rest = op_hex_rest[:16], op_hex_rest[16:]
       hexdata = make_hexdata(op_hex_first)
-    print(f'{lineno:5}/{addr:>8X} : {hexdata:{hexwidth}}  {line}',
-          file=listing_file)
+    listing.append(f'{lineno:5}/{addr:>8X} : {hexdata:{hexwidth}}  {line}\n')
 
     # Print any hex data that remains in 16-digit chunks.
     while op_hex_rest:
       addr += 8
       op_hex_first, op_hex_rest = op_hex_rest[:16], op_hex_rest[16:]
       hexdata = make_hexdata(op_hex_first)
-      print(f'{lineno:5}/{addr:>8X} : {hexdata:{hexwidth}}', file=listing_file)
+      listing.append(f'{lineno:5}/{addr:>8X} : {hexdata:{hexwidth}}\n')
+
+  listing_file.write(''.join(listing))
 
 
 def main(FLAGS: argparse.Namespace):